@@ -11,7 +11,9 @@ Cómo usar:
 
 Características:
 - Verifica que el archivo y hojas existan antes de procesar
-- Carga los datos manteniendo los existentes (no borra información previa)
+- Cada ejecución vacía las tablas (TRUNCATE ... CASCADE) y las vuelve a cargar
+  desde el Excel: se pierde la información previa, incluida la de otras
+  tablas con claves foráneas hacia clientes, productos o ventas
 - Proporciona feedback claro durante el proceso
 - Maneja errores de forma elegante
 
@@ -22,9 +24,14 @@ para no tener las credenciales visibles en el codigo principal.
 
 import pandas as pd
 from sqlalchemy import create_engine, text
+from psycopg2 import sql
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import io
 import os
-from openpyxl import load_workbook
 import sys
+import zipfile
+import xml.etree.ElementTree as ET
 from pathlib import Path
 
 # Configuracion de rutas
@@ -34,6 +41,77 @@ from config.database import get_db_uri
 # Ruta al archivo Excel con los datos
 EXCEL_PATH = "./data/input/datos_fuente.xlsx"
 
+# Método de carga: "copy" (COPY FROM STDIN, el más rápido) o "insert"
+# (to_sql con INSERT multi-fila, para cuando COPY no sea posible).
+# Se puede elegir desde afuera con la variable de entorno LOADER_METHOD
+METODOS_CARGA = ("copy", "insert")
+METODO_CARGA = os.environ.get("LOADER_METHOD", "copy").strip().lower()
+
+# Carga masiva de ventas (la tabla más grande): durante la carga la tabla
+# queda sin índices secundarios, que se recrean al final en una sola pasada
+# en lugar de actualizarse fila por fila. El WAL no se reduce: se sigue
+# escribiendo el de cada fila cargada (y el de los índices al recrearlos).
+CARGA_MASIVA = False
+
+# Hojas a cargar, en el orden correcto
+# (primero clientes, luego productos, finalmente ventas)
+HOJAS = ['clientes', 'productos', 'ventas']
+
+# Tipos de datos de cada hoja, para que pandas no tenga que inferirlos
+DTYPES = {
+    'clientes': {
+        'cliente_id': 'Int64',
+        'nombre': 'string',
+        'email': 'string',
+        'direccion': 'string'
+    },
+    'productos': {
+        'producto_id': 'Int64',
+        'nombre': 'string',
+        'precio': 'float64',
+        'categoria': 'string'
+    },
+    'ventas': {
+        'venta_id': 'Int64',
+        'cliente_id': 'Int64',
+        'producto_id': 'Int64',
+        'cantidad': 'Int64',
+        'monto_total': 'float64'
+    }
+}
+
+# Columnas de fecha de cada hoja
+PARSE_DATES = {'ventas': ['fecha']}
+
+# Motor de conexión compartido (se crea la primera vez que se necesita)
+_engine = None
+
+def get_engine():
+    """
+    Devuelve el motor de conexión del módulo, creándolo si no existe.
+    
+    El pool se reutiliza en todas las llamadas y se libera al salir del
+    proceso. Las sesiones usan synchronous_commit=off: los COMMIT no esperan
+    la escritura del WAL a disco, a cambio de poder perder las últimas
+    transacciones si el servidor se cae (la carga se puede repetir).
+    
+    Returns:
+        Engine: Motor SQLAlchemy con pool de conexiones
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            get_db_uri(),
+            pool_pre_ping=True,  # Descarta conexiones caídas antes de usarlas
+            pool_size=4,
+            connect_args={'options': '-c synchronous_commit=off'},
+            executemany_mode="values_plus_batch",  # Agrupa los INSERT en lotes multi-fila
+            insertmanyvalues_page_size=10000,
+            executemany_batch_page_size=500
+        )
+        atexit.register(_engine.dispose)
+    return _engine
+
 def verificar_archivo_excel():
     """
     Revisa que el archivo Excel esté en su lugar y tenga las hojas necesarias.
@@ -44,13 +122,15 @@ def verificar_archivo_excel():
     if not os.path.exists(EXCEL_PATH):
         raise FileNotFoundError(f"❌ No encuentro el archivo Excel en: {EXCEL_PATH}")
     
-    # Cargar el libro de trabajo y verificar hojas
-    wb = load_workbook(EXCEL_PATH)
-    hojas_necesarias = ['clientes', 'productos', 'ventas']
-    hojas_en_excel = wb.sheetnames
+    # Leer solo la lista de hojas: un .xlsx es un ZIP y los nombres están
+    # en xl/workbook.xml, sin necesidad de abrir ninguna hoja
+    with zipfile.ZipFile(EXCEL_PATH) as archivo_zip:
+        raiz = ET.parse(archivo_zip.open('xl/workbook.xml')).getroot()
+    ns = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    hojas_en_excel = [hoja.get('name') for hoja in raiz.findall('.//m:sheet', ns)]
     
     # Verificar cada hoja requerida
-    for hoja in hojas_necesarias:
+    for hoja in HOJAS:
         if hoja not in hojas_en_excel:
             raise ValueError(
                 f"❌ La hoja '{hoja}' no está en el Excel. "
@@ -60,13 +140,134 @@ def verificar_archivo_excel():
     print("✓ Archivo Excel verificado correctamente")
     return True
 
-def cargar_datos(engine, hoja):
+def leer_hojas():
+    """
+    Lee todas las hojas del Excel en paralelo.
+    
+    Cada hoja se lee en su propio hilo y con su propio manejador de archivo,
+    así no se comparte estado entre lecturas.
+    
+    Returns:
+        dict: {nombre_hoja: DataFrame} para cada hoja de HOJAS
+    """
+    def leer_hoja(hoja):
+        return pd.read_excel(
+            EXCEL_PATH,
+            sheet_name=hoja,
+            engine="calamine",
+            dtype=DTYPES[hoja],
+            parse_dates=PARSE_DATES.get(hoja)
+        )
+    
+    with ThreadPoolExecutor(max_workers=len(HOJAS)) as executor:
+        return dict(zip(HOJAS, executor.map(leer_hoja, HOJAS)))
+
+def limpiar_tablas(engine, datos_por_hoja):
+    """
+    Deja las tablas vacías antes de la carga.
+    
+    Crea las tablas que no existan con la estructura de su hoja y luego las
+    vacía todas con un único TRUNCATE, en una sola transacción.
+    
+    Args:
+        engine: Conexión a la base de datos
+        datos_por_hoja: dict {nombre_hoja: DataFrame} leído del Excel
+    """
+    with engine.begin() as conn:
+        for hoja in HOJAS:
+            datos_por_hoja[hoja].head(0).to_sql(name=hoja, con=conn, if_exists="append", index=False)
+        conn.execute(text(f"TRUNCATE TABLE {', '.join(HOJAS)} RESTART IDENTITY CASCADE"))
+    
+    print("✓ Tablas vaciadas")
+
+def preparar_carga_masiva(engine):
+    """
+    Prepara la tabla ventas para una carga masiva.
+    
+    Elimina sus índices secundarios (los de PK y UNIQUE se mantienen) para
+    que la carga no los actualice fila por fila.
+    
+    Args:
+        engine: Conexión a la base de datos
+    
+    Returns:
+        list: Definiciones (CREATE INDEX ...) de los índices eliminados
+    """
+    with engine.begin() as conn:
+        indices = conn.execute(text("""
+            SELECT i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = current_schema()
+              AND i.tablename = 'ventas'
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_constraint c
+                  WHERE c.conindid = (quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass
+              )
+        """)).fetchall()
+        
+        for nombre, _ in indices:
+            conn.execute(text(f'DROP INDEX "{nombre}"'))
+    
+    print(f"✓ Modo carga masiva: {len(indices)} índices de 'ventas' suspendidos")
+    return [definicion for _, definicion in indices]
+
+def finalizar_carga_masiva(engine, indices):
+    """
+    Devuelve la tabla ventas a su estado normal después de la carga.
+    
+    Recrea los índices en una sola pasada sobre los datos ya cargados.
+    
+    Args:
+        engine: Conexión a la base de datos
+        indices: Definiciones devueltas por preparar_carga_masiva
+    """
+    with engine.begin() as conn:
+        for definicion in indices:
+            conn.execute(text(definicion))
+    
+    print("✓ Tabla 'ventas' restaurada (índices recreados)")
+
+def copiar_datos(engine, datos, tabla):
+    """
+    Carga un DataFrame a PostgreSQL usando COPY FROM STDIN.
+    
+    Los datos viajan como un único CSV en memoria en lugar de un INSERT
+    por fila, lo que es mucho más rápido para cargas masivas.
+    
+    Args:
+        engine: Conexión a la base de datos
+        datos: DataFrame con los datos a cargar
+        tabla: Nombre de la tabla destino
+    """
+    # Volcar el DataFrame a un CSV en memoria (\N representa los nulos)
+    buffer = io.StringIO()
+    datos.to_csv(buffer, index=False, header=False, na_rep='\\N')
+    buffer.seek(0)
+    
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT CSV, NULL '\\N')").format(
+        sql.Identifier(tabla),
+        sql.SQL(', ').join(map(sql.Identifier, datos.columns))
+    )
+    
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.copy_expert(copy_sql, buffer)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+def cargar_datos(engine, hoja, datos):
     """
     Carga los datos de una hoja Excel a la base de datos.
     
     Args:
         engine: Conexión a la base de datos
         hoja: Nombre de la hoja a cargar (clientes, productos o ventas)
+        datos: DataFrame con el contenido de la hoja
     
     Returns:
         bool: True si la carga fue exitosa, False si hubo error
@@ -74,21 +275,24 @@ def cargar_datos(engine, hoja):
     try:
         print(f"\nProcesando hoja: {hoja}...")
         
-        # Leer datos del Excel
-        datos = pd.read_excel(EXCEL_PATH, sheet_name=hoja)
-        
         # Verificar si hay datos
         if datos.empty:
             print(f"⚠️ Advertencia: La hoja '{hoja}' está vacía")
             return False
         
         # Cargar a PostgreSQL
-        datos.to_sql(
-            name=hoja,
-            con=engine,
-            if_exists="replace",  # Se puede agregar un replace o append, depende si se quere agregar o remplazar, sigue manteniento el enfoque de la logica ETL
-            index=False
-        )
+        if METODO_CARGA == "insert":
+            # INSERT multi-fila por lotes (el engine los agrupa en VALUES)
+            datos.to_sql(
+                name=hoja,
+                con=engine,
+                if_exists="append",  # Se puede agregar un replace o append, depende si se quere agregar o remplazar, sigue manteniento el enfoque de la logica ETL
+                index=False,
+                method="multi",
+                chunksize=10000
+            )
+        else:
+            copiar_datos(engine, datos, hoja)
         
         print(f"✓ Datos cargados: {len(datos)} registros en '{hoja}'")
         return True
@@ -104,27 +308,42 @@ def main():
     2. Conecta a la base de datos
     3. Carga los datos en orden
     4. Proporciona un resumen final
+    
+    Returns:
+        bool: True si todas las hojas se cargaron, False en caso contrario
     """
     print("\n" + "="*50)
     print("  INICIANDO CARGA DE DATOS EXCEL → POSTGRESQL")
     print("="*50)
     
     try:
-        # PASO 1: Verificar que el Excel esté correcto
+        # PASO 1: Verificar la configuración y que el Excel esté correcto, y
+        # leer todas las hojas en paralelo (calamine es mucho más rápido que openpyxl)
+        if METODO_CARGA not in METODOS_CARGA:
+            raise ValueError(
+                f"❌ LOADER_METHOD inválido: '{METODO_CARGA}'. "
+                f"Valores permitidos: {', '.join(METODOS_CARGA)}"
+            )
         verificar_archivo_excel()
+        datos_por_hoja = leer_hojas()
         
         # PASO 2: Conectar a la base de datos
         print("\nConectando a la base de datos...")
-        engine = create_engine(get_db_uri())
+        engine = get_engine()
         print("✓ Conexión establecida")
         
-        # PASO 3: Cargar datos en el orden correcto
-        # (primero clientes, luego productos, finalmente ventas)
-        hojas_a_cargar = ['clientes', 'productos', 'ventas']
+        # PASO 3: Vaciar las tablas y cargar datos en el orden correcto
+        limpiar_tablas(engine, datos_por_hoja)
+        if CARGA_MASIVA:
+            indices = preparar_carga_masiva(engine)
         resultados = []
         
-        for hoja in hojas_a_cargar:
-            resultados.append(cargar_datos(engine, hoja))
+        try:
+            for hoja in HOJAS:
+                resultados.append(cargar_datos(engine, hoja, datos_por_hoja[hoja]))
+        finally:
+            if CARGA_MASIVA:
+                finalizar_carga_masiva(engine, indices)
         
         # PASO 4: Mostrar resumen final
         print("\n" + "="*50)
@@ -133,16 +352,13 @@ def main():
         else:
             print("⚠️ CARGA PARCIAL: Algunos datos no se cargaron (ver errores arriba)")
         print("="*50)
+        return all(resultados)
             
     except Exception as error:
         print("\n" + "❌"*10)
         print(f"ERROR CRÍTICO: {str(error)}")
         print("❌"*10)
-    finally:
-        # Asegurarse de cerrar la conexión a la DB
-        if 'engine' in locals():
-            engine.dispose()
-            print("\nConexión a la base de datos cerrada")
+        return False
 
 # Punto de entrada del script
 if __name__ == "__main__":
@@ -3,7 +3,7 @@ SCRIPT DE GENERACIÓN Y ENVÍO DE REPORTES DE VENTAS DESDE POSTGRESQL
 
 Este script automatiza:
 1. Extracción de datos de ventas desde PostgreSQL
-2. Generación de reporte en Excel con formato profesional
+2. Generación de reporte en Excel con formato profesional (o CSV comprimido)
 3. Envío por email con métricas resumidas y archivo adjunto
 4. Manejo de errores y reintentos automáticos
 
@@ -12,14 +12,19 @@ Configuración requerida:
 - Configuración de email en config/email.py
 """
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
+from email.mime.base import MIMEBase
+from email.utils import getaddresses
+import atexit
+import base64
+import gzip
+import io
 import os
 from datetime import datetime
-from openpyxl import Workbook
+import xlsxwriter
 import sys
 from pathlib import Path
 import time
@@ -42,11 +47,70 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 # Importar configuraciones externas
 from config.database import get_db_uri  # Credenciales de DB
 from config.email import EMAIL_CONFIG  # Configuración de email
+from metricas import obtener_metricas_sql  # Métricas calculadas en la DB
+from excel_filas import filas_para_excel  # Filas listas para xlsxwriter
+
+# Formato del reporte adjunto: "xlsx" (Excel con formato), "csv.gz"
+# (CSV comprimido generado directamente por PostgreSQL, sin pasar por pandas)
+# o "parquet" (columnar comprimido con snappy, el adjunto más liviano)
+FORMATO_REPORTE = "xlsx"
+
+# Subtipo MIME y descripción (para el cuerpo del email) de cada formato
+FORMATOS_ADJUNTO = {
+    "xlsx": ("xlsx", "Excel"),
+    "csv.gz": ("gzip", "CSV comprimido"),
+    "parquet": ("octet-stream", "Parquet")
+}
+
+# Tamaño máximo del reporte para adjuntarlo (bytes). Los servidores de correo
+# suelen rechazar mensajes de más de 20-25 MB, y el adjunto codificado en
+# base64 ocupa un tercio más; por encima de este límite el reporte queda en
+# disco y el email solo indica su ubicación
+TAMANO_MAXIMO_ADJUNTO = 15 * 1024 * 1024
+
+# Tiempo máximo (segundos) de espera por el servidor SMTP en cada operación
+SMTP_TIMEOUT = 30
+
+# Consulta de ventas con fecha (todo el rango disponible, sin parámetros)
+QUERY_VENTAS = """
+    SELECT 
+        v.venta_id,
+        v.fecha,
+        c.nombre AS cliente,
+        p.nombre AS producto,
+        v.cantidad,
+        v.monto_total
+    FROM ventas v
+    JOIN clientes c ON v.cliente_id = c.cliente_id
+    JOIN productos p ON v.producto_id = p.producto_id
+    WHERE v.fecha IS NOT NULL
+    ORDER BY v.fecha DESC
+"""
+
+# Motor de conexión compartido (se crea la primera vez que se necesita)
+_engine = None
 
 # ==============================================
 # FUNCIONES PRINCIPALES
 # ==============================================
 
+def get_engine():
+    """
+    Devuelve el motor de conexión del módulo, creándolo si no existe
+    
+    Returns:
+        Engine: Motor SQLAlchemy con pool reutilizable (se libera al salir)
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            get_db_uri(),
+            pool_pre_ping=True,  # Descarta conexiones caídas antes de usarlas
+            pool_size=4
+        )
+        atexit.register(_engine.dispose)
+    return _engine
+
 def conectar_postgres():
     """
     Establece conexión con la base de datos PostgreSQL
@@ -55,31 +119,139 @@ def conectar_postgres():
         engine: Objeto de conexión SQLAlchemy o None si falla
     """
     try:
-        # Crear motor de conexión usando la URI de la DB
-        engine = create_engine(get_db_uri())
+        # Obtener el motor compartido (reutiliza el pool entre llamadas)
+        engine = get_engine()
         logging.info("✅ Conexión exitosa a PostgreSQL")
         return engine
     except Exception as e:
         logging.error(f"❌ Error de conexión: {str(e)}")
         return None
 
-def obtener_rango_fechas(engine):
+def copiar_ventas(conn, destino):
     """
-    Obtiene el rango de fechas disponible en la tabla de ventas
+    Vuelca las ventas como CSV con COPY ... TO STDOUT
+    
+    PostgreSQL envía el resultado como un único CSV, en lugar de pasar
+    fila por fila por el cursor de Python.
     
     Args:
-        engine: Conexión activa a la base de datos
+        conn: Conexión abierta a la base de datos
+        destino: Archivo (o buffer) binario donde se escribe el CSV
         
     Returns:
-        tuple: (fecha_min, fecha_max) o None si hay error
+        int: Cantidad de ventas copiadas
     """
+    # Cursor de psycopg2 sobre la misma conexión (COPY no pasa por SQLAlchemy)
+    cursor = conn.connection.cursor()
     try:
-        with engine.connect() as conn:
-            # Consulta SQL para obtener fechas mínima y máxima
-            result = conn.execute(text("SELECT MIN(fecha), MAX(fecha) FROM ventas"))
-            return result.fetchone()
+        cursor.copy_expert(f"COPY ({QUERY_VENTAS}) TO STDOUT WITH (FORMAT CSV, HEADER)", destino)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def obtener_ventas(conn):
+    """
+    Extrae las ventas a un DataFrame
+    
+    Args:
+        conn: Conexión abierta a la base de datos
+        
+    Returns:
+        DataFrame: Ventas con info de clientes y productos o None si hay error
+    """
+    try:
+        buffer = io.BytesIO()
+        copiar_ventas(conn, buffer)
+        buffer.seek(0)
+        # El lector CSV de Arrow es multihilo y arma las columnas sin pasar
+        # cada valor por Python. Los nombres se leen tal cual (texto, sin
+        # interpretar "NA", "null" o "0012"): solo el campo vacío es nulo
+        df = pd.read_csv(
+            buffer,
+            parse_dates=['fecha'],
+            engine='pyarrow',
+            dtype={'cliente': 'string', 'producto': 'string'},
+            keep_default_na=False,
+            na_values=['']
+        )
+        
+        # Tipos fijos (el esquema del Parquet no cambia entre ejecuciones):
+        # ids y cantidades en enteros de 32 bits, montos en float64 (float32
+        # pierde precisión por encima de ~16 millones) y los nombres repetidos
+        # de clientes y productos como categorías. Int32 admite nulos: una
+        # cantidad NULL queda como pd.NA (en el Parquet, nulo en int32) y los
+        # reportes Excel la escriben como celda vacía (ver excel_filas)
+        return df.astype({
+            'venta_id': 'Int32',
+            'cantidad': 'Int32',
+            'monto_total': 'float64',
+            'cliente': 'category',
+            'producto': 'category'
+        })
+    except Exception as e:
+        logging.error(f"❌ Error al consultar ventas: {str(e)}")
+        return None
+
+def generar_reporte_csv(conn, fecha_min, fecha_max):
+    """
+    Genera el reporte como CSV comprimido directamente desde PostgreSQL
+    
+    El CSV de COPY se escribe comprimido a disco sin construir un DataFrame
+    ni un Excel, para cuando el destino no necesita el formato.
+    
+    Args:
+        conn: Conexión abierta a la base de datos
+        fecha_min: Fecha inicial del período
+        fecha_max: Fecha final del período
+        
+    Returns:
+        tuple: (ruta del archivo generado, total de ventas) o None si falla
+    """
+    try:
+        # Crear directorio para reportes si no existe
+        os.makedirs('reportes', exist_ok=True)
+        
+        # Nombre del archivo con rango de fechas
+        nombre_reporte = f"reportes/reporte_ventas_{fecha_min.strftime('%Y%m%d')}_{fecha_max.strftime('%Y%m%d')}.csv.gz"
+        
+        with gzip.open(nombre_reporte, 'wb') as archivo:
+            total_registros = copiar_ventas(conn, archivo)
+        
+        logging.info(f"📊 Reporte generado: {nombre_reporte}")
+        return nombre_reporte, total_registros
+    except Exception as e:
+        logging.error(f"❌ Error al generar CSV: {str(e)}")
+        return None
+
+def generar_reporte_parquet(df, fecha_min, fecha_max):
+    """
+    Genera el reporte como archivo Parquet comprimido con snappy
+    
+    Los montos se guardan como números binarios y los nombres repetidos de
+    clientes y productos en diccionario, así el archivo es mucho más chico
+    que un Excel con los mismos datos.
+    
+    Args:
+        df: DataFrame con los datos de ventas
+        fecha_min: Fecha inicial del período
+        fecha_max: Fecha final del período
+        
+    Returns:
+        str: Ruta del archivo generado o None si falla
+    """
+    try:
+        # Crear directorio para reportes si no existe
+        os.makedirs('reportes', exist_ok=True)
+        
+        # Nombre del archivo con rango de fechas
+        nombre_reporte = f"reportes/reporte_ventas_{fecha_min.strftime('%Y%m%d')}_{fecha_max.strftime('%Y%m%d')}.parquet"
+        
+        df.to_parquet(nombre_reporte, engine='pyarrow', compression='snappy', index=False)
+        
+        logging.info(f"📊 Reporte generado: {nombre_reporte}")
+        return nombre_reporte
     except Exception as e:
-        logging.error(f"❌ Error al obtener rango de fechas: {str(e)}")
+        logging.error(f"❌ Error al generar Parquet: {str(e)}")
         return None
 
 def generar_reporte_excel(df, fecha_min, fecha_max):
@@ -101,27 +273,32 @@ def generar_reporte_excel(df, fecha_min, fecha_max):
         # Nombre del archivo con rango de fechas
         nombre_reporte = f"reportes/reporte_ventas_{fecha_min.strftime('%Y%m%d')}_{fecha_max.strftime('%Y%m%d')}.xlsx"
         
-        # Crear archivo Excel con pandas y openpyxl
-        with pd.ExcelWriter(nombre_reporte, engine='openpyxl') as writer:
-            # Exportar DataFrame a Excel
-            df.to_excel(writer, index=False, sheet_name='Ventas')
-            
-            # Obtener objetos para formateo
-            workbook = writer.book
-            worksheet = writer.sheets['Ventas']
-            
-            # Formatear columna de fechas
-            for cell in worksheet['B'][1:]:
-                cell.number_format = 'DD/MM/YYYY'
-            
-            # Ajustar anchos de columnas
-            column_widths = {'A': 10, 'B': 12, 'C': 25, 'D': 25, 'E': 10, 'F': 18}
-            for col, width in column_widths.items():
-                worksheet.column_dimensions[col].width = width
-            
-            # Formatear columna de montos (moneda)
-            for cell in worksheet['F'][1:]:
-                cell.number_format = '"Gs."#,##0'
+        # Crear archivo Excel con xlsxwriter en modo constant_memory:
+        # cada fila se escribe a disco apenas se completa, así la memoria
+        # no crece con la cantidad de ventas
+        workbook = xlsxwriter.Workbook(nombre_reporte, {'constant_memory': True})
+        worksheet = workbook.add_worksheet('Ventas')
+        
+        # Formatos (encabezado como el de pandas, fechas y montos en moneda)
+        formato_encabezado = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+        formato_fecha = workbook.add_format({'num_format': 'DD/MM/YYYY'})
+        formato_moneda = workbook.add_format({'num_format': '"Gs."#,##0'})
+        
+        # Ajustar anchos de columnas (y formato de las columnas de fecha y monto)
+        column_widths = {'A': 10, 'C': 25, 'D': 25, 'E': 10}
+        for col, width in column_widths.items():
+            worksheet.set_column(f'{col}:{col}', width)
+        worksheet.set_column('B:B', 12, formato_fecha)
+        worksheet.set_column('F:F', 18, formato_moneda)
+        
+        # Exportar DataFrame a Excel, fila por fila y en orden
+        # (constant_memory no permite volver a filas ya escritas). Las fechas
+        # van como número de serie y los NULL como celdas vacías
+        worksheet.write_row(0, 0, df.columns, formato_encabezado)
+        for fila, valores in enumerate(filas_para_excel(df), start=1):
+            worksheet.write_row(fila, 0, valores)
+        
+        workbook.close()
         
         logging.info(f"📊 Reporte generado: {nombre_reporte}")
         return nombre_reporte
@@ -129,27 +306,55 @@ def generar_reporte_excel(df, fecha_min, fecha_max):
         logging.error(f"❌ Error al generar Excel: {str(e)}")
         return None
 
-def obtener_metricas_ventas(df):
+def conectar_smtp():
     """
-    Calcula métricas clave a partir de los datos de ventas
+    Abre una sesión SMTP autenticada y con TLS
+    
+    Returns:
+        smtplib.SMTP: Conexión lista para enviar mensajes
+    """
+    server = smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port'], timeout=SMTP_TIMEOUT)
+    try:
+        server.starttls()  # Seguridad TLS
+        server.login(EMAIL_CONFIG['email_from'], EMAIL_CONFIG['email_password'])
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def crear_adjunto(reporte_path, subtipo):
+    """
+    Crea el adjunto MIME codificando el archivo en base64 por bloques
+    
+    El archivo se lee de a bloques desde disco, así nunca están en memoria a
+    la vez el contenido completo y su versión codificada.
     
     Args:
-        df: DataFrame con los datos de ventas
+        reporte_path: Ruta del archivo a adjuntar
+        subtipo: Subtipo MIME de application (xlsx, gzip...)
         
     Returns:
-        dict: Diccionario con las métricas calculadas
+        MIMEBase: Parte del mensaje lista para adjuntar
     """
-    return {
-        'total': df['monto_total'].sum(),
-        'producto_top': df.groupby('producto')['monto_total'].sum().idxmax(),
-        'monto_producto': df.groupby('producto')['monto_total'].sum().max(),
-        'cliente_top': df.groupby('cliente')['monto_total'].sum().idxmax(),
-        'monto_cliente': df.groupby('cliente')['monto_total'].sum().max()
-    }
+    bloques = []
+    with open(reporte_path, "rb") as f:
+        # 57 bytes originales = una línea de 76 caracteres en base64
+        for bloque in iter(lambda: f.read(57 * 1024), b""):
+            bloques.append(base64.encodebytes(bloque).decode("ascii"))
+    
+    adjunto = MIMEBase("application", subtipo)
+    adjunto.set_payload("".join(bloques))
+    adjunto['Content-Transfer-Encoding'] = 'base64'
+    adjunto.add_header('Content-Disposition', 'attachment', 
+                       filename=os.path.basename(reporte_path))
+    return adjunto
 
-def enviar_email_con_reintentos(reporte_path, metrics, fecha_min, fecha_max, total_registros, max_intentos=3):
+def construir_mensaje(reporte_path, metrics, fecha_min, fecha_max, total_registros):
     """
-    Envía email con reporte adjunto y sistema de reintentos
+    Arma el mensaje MIME con el resumen y el reporte adjunto
+    
+    Si el reporte supera TAMANO_MAXIMO_ADJUNTO no se lee ni se adjunta: el
+    cuerpo del email indica dónde quedó guardado.
     
     Args:
         reporte_path: Ruta del archivo a adjuntar
@@ -157,24 +362,32 @@ def enviar_email_con_reintentos(reporte_path, metrics, fecha_min, fecha_max, tot
         fecha_min: Fecha inicio del reporte
         fecha_max: Fecha fin del reporte
         total_registros: Total de ventas procesadas
-        max_intentos: Intentos máximos de envío
         
     Returns:
-        bool: True si tuvo éxito, False si falló
+        MIMEMultipart: Mensaje listo para enviar (reutilizable entre intentos)
     """
-    intento = 1
-    while intento <= max_intentos:
-        try:
-            logging.info(f"✉️ Procesando envío de email (Intento {intento}/{max_intentos})...")
-            
-            # 1. CONFIGURAR MENSAJE MIME
-            msg = MIMEMultipart()
-            msg['From'] = EMAIL_CONFIG['email_from']
-            msg['To'] = EMAIL_CONFIG['email_to']
-            msg['Subject'] = f"REPORTE VENTAS {fecha_min.strftime('%d-%m-%Y')} al {fecha_max.strftime('%d-%m-%Y')}"
-            
-            # 2. CREAR CUERPO DEL EMAIL
-            cuerpo = f"""
+    # Formato según la extensión del archivo (xlsx, csv.gz o parquet)
+    subtipo, descripcion = FORMATOS_ADJUNTO[os.path.basename(reporte_path).split('.', 1)[1]]
+    
+    # Verificar el tamaño antes de leer el archivo
+    tamano = os.path.getsize(reporte_path)
+    adjuntar = tamano <= TAMANO_MAXIMO_ADJUNTO
+    if adjuntar:
+        nota_reporte = f"Se adjunta el reporte detallado en formato {descripcion}."
+    else:
+        logging.warning(f"⚠️ Reporte de {tamano / 1024 / 1024:.1f} MB: se envía sin adjunto")
+        nota_reporte = (f"El reporte detallado en formato {descripcion} ({tamano / 1024 / 1024:.1f} MB) "
+                        f"supera el tamaño permitido para adjuntos.\n"
+                        f"Quedó guardado en: {os.path.abspath(reporte_path)}")
+    
+    # 1. CONFIGURAR MENSAJE MIME
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_CONFIG['email_from']
+    msg['To'] = EMAIL_CONFIG['email_to']
+    msg['Subject'] = f"REPORTE VENTAS {fecha_min.strftime('%d-%m-%Y')} al {fecha_max.strftime('%d-%m-%Y')}"
+    
+    # 2. CREAR CUERPO DEL EMAIL
+    cuerpo = f"""
 REPORTE DE VENTAS - RESUMEN
 ==========================
 
@@ -189,32 +402,87 @@ MÉTRICAS PRINCIPALES
 
 TOTAL VENTAS ANALIZADAS: {total_registros}
 
-Se adjunta el reporte detallado en formato Excel.
+{nota_reporte}
 """
-            msg.attach(MIMEText(cuerpo, 'plain'))
-            
-            # 3. ADJUNTAR ARCHIVO EXCEL
-            with open(reporte_path, "rb") as f:
-                adjunto = MIMEApplication(f.read(), _subtype="xlsx")
-                adjunto.add_header('Content-Disposition', 'attachment', 
-                                filename=f"reporte_ventas_{fecha_min.strftime('%Y%m%d')}_{fecha_max.strftime('%Y%m%d')}.xlsx")
-                msg.attach(adjunto)
+    msg.attach(MIMEText(cuerpo, 'plain'))
+    
+    # 3. ADJUNTAR ARCHIVO DEL REPORTE (solo si no supera el límite)
+    if adjuntar:
+        msg.attach(crear_adjunto(reporte_path, subtipo))
+    return msg
+
+def enviar_email_con_reintentos(reporte_path, metrics, fecha_min, fecha_max, total_registros, max_intentos=3):
+    """
+    Envía email con reporte adjunto y sistema de reintentos
+    
+    El mensaje (con el adjunto ya leído del disco) se arma y se serializa a
+    bytes una sola vez; en cada intento solo se repite el envío.
+    
+    Args:
+        reporte_path: Ruta del archivo a adjuntar
+        metrics: Métricas calculadas
+        fecha_min: Fecha inicio del reporte
+        fecha_max: Fecha fin del reporte
+        total_registros: Total de ventas procesadas
+        max_intentos: Intentos máximos de envío
+        
+    Returns:
+        bool: True si tuvo éxito, False si falló
+    """
+    try:
+        msg = construir_mensaje(reporte_path, metrics, fecha_min, fecha_max, total_registros)
+        remitente = msg['From']
+        destinatarios = [direccion for _, direccion in getaddresses(msg.get_all('To', []))]
+        # Serializar una sola vez (con fin de línea SMTP): send_message volvería
+        # a generar el texto completo del mensaje en cada intento
+        datos = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+        del msg  # Solo se necesita la versión serializada
+    except Exception as e:
+        logging.error(f"❌ Error al armar el email: {str(e)}")
+        return False
+    
+    server = None  # Conexión SMTP reutilizada entre intentos
+    intento = 1
+    while intento <= max_intentos:
+        try:
+            logging.info(f"✉️ Procesando envío de email (Intento {intento}/{max_intentos})...")
             
-            # 4. ENVIAR EMAIL POR SMTP
-            with smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port']) as server:
-                server.starttls()  # Seguridad TLS
-                server.login(EMAIL_CONFIG['email_from'], EMAIL_CONFIG['email_password'])
-                server.send_message(msg)
-                logging.info("✅ Email enviado exitosamente")
-                return True
+            # ENVIAR EMAIL POR SMTP
+            # (solo se conecta si no hay una sesión abierta de un intento anterior)
+            if server is None:
+                server = conectar_smtp()
+            server.sendmail(remitente, destinatarios, datos)
+            logging.info("✅ Email enviado exitosamente")
+            # El email ya salió: si el QUIT falla solo se cierra el socket,
+            # sin pasar por los reintentos (que lo enviarían de nuevo)
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                server.close()
+            return True
                 
         except Exception as e:
             logging.error(f"❌ Error al enviar email (Intento {intento}): {str(e)}")
+            
+            # Si se perdió la conexión, se vuelve a conectar en el próximo
+            # intento. Se mira el estado real de la sesión y no solo el tipo
+            # de error: ante un 421 (en cualquier comando, incluido RCPT TO,
+            # que llega como SMTPRecipientsRefused) smtplib ya cerró el socket
+            desconectado = isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError))
+            if server is not None and (desconectado or server.sock is None):
+                server.close()
+                server = None
+            
             if intento < max_intentos:
-                logging.info(f"⏳ Reintentando en 5 segundos...")
-                time.sleep(5)
+                # Espera exponencial: 5, 10, 20... segundos (máximo 60)
+                espera = min(5 * 2 ** (intento - 1), 60)
+                logging.info(f"⏳ Reintentando en {espera} segundos...")
+                time.sleep(espera)
             intento += 1
     
+    if server is not None:
+        server.close()
+    
     logging.error(f"🚨 No se pudo enviar el email después de {max_intentos} intentos")
     return False
 
@@ -238,55 +506,44 @@ def main():
         return
     
     try:
-        # 2. OBTENER RANGO DE FECHAS
-        fechas = obtener_rango_fechas(engine)
-        if not fechas:
-            return
-        fecha_min, fecha_max = fechas
-        logging.info(f"📅 Rango de fechas disponible: {fecha_min} a {fecha_max}")
-        
-        # 3. CONSULTAR DATOS DE VENTAS
-        query = text("""
-        SELECT 
-            v.venta_id,
-            v.fecha,
-            c.nombre AS cliente,
-            p.nombre AS producto,
-            v.cantidad,
-            v.monto_total
-        FROM ventas v
-        JOIN clientes c ON v.cliente_id = c.cliente_id
-        JOIN productos p ON v.producto_id = p.producto_id
-        WHERE v.fecha BETWEEN :fecha_inicio AND :fecha_fin
-        ORDER BY v.fecha DESC
-        """)
-        
+        # Una sola conexión para todas las consultas (métricas y ventas)
         with engine.connect() as conn:
-            df = pd.read_sql(
-                query, 
-                conn,
-                params={"fecha_inicio": fecha_min, "fecha_fin": fecha_max}
-            )
-            
-            if df.empty:
-                logging.warning("⚠️ No hay ventas en el período disponible")
+            # 2. CALCULAR MÉTRICAS Y RANGO DE FECHAS (en la base de datos)
+            metrics = obtener_metricas_sql(conn)
+            if metrics is None:
                 return
             
-            # 4. CALCULAR MÉTRICAS
-            metrics = obtener_metricas_ventas(df)
-            
-            # 5. GENERAR REPORTE EXCEL
-            reporte_path = generar_reporte_excel(df, fecha_min, fecha_max)
-            if not reporte_path:
+            if not metrics:
+                logging.warning("⚠️ No hay ventas en el período disponible")
                 return
+            fecha_min, fecha_max = metrics['fecha_min'], metrics['fecha_max']
+            logging.info(f"📅 Rango de fechas disponible: {fecha_min} a {fecha_max}")
             
-            # 6. ENVIAR EMAIL CON REPORTE
-            enviar_email_con_reintentos(reporte_path, metrics, fecha_min, fecha_max, len(df))
+            # 3. CONSULTAR VENTAS Y GENERAR REPORTE
+            if FORMATO_REPORTE == "csv.gz":
+                resultado = generar_reporte_csv(conn, fecha_min, fecha_max)
+                if not resultado:
+                    return
+                reporte_path, total_registros = resultado
+            else:
+                df = obtener_ventas(conn)
+                if df is None:
+                    return
+                
+                if FORMATO_REPORTE == "parquet":
+                    reporte_path = generar_reporte_parquet(df, fecha_min, fecha_max)
+                else:
+                    reporte_path = generar_reporte_excel(df, fecha_min, fecha_max)
+                if not reporte_path:
+                    return
+                total_registros = len(df)
+        
+        # 4. ENVIAR EMAIL CON REPORTE
+        enviar_email_con_reintentos(reporte_path, metrics, fecha_min, fecha_max, total_registros)
             
     except Exception as e:
         logging.error(f"❌ Error inesperado: {str(e)}")
     finally:
-        engine.dispose()
         logging.info("🔚 Proceso completado")
 
 # Punto de entrada del script
@@ -0,0 +1,30 @@
+"""
+FILAS DE VENTAS LISTAS PARA ESCRIBIR CON XLSXWRITER
+
+Conversión compartida por los reportes Excel de envio_email y
+reporte_ventas, que escriben fila por fila con write_row:
+- fecha como número de serie de Excel (el formato lo aplica la columna)
+- valores faltantes (NULL en la base: pd.NA, NaN, NaT) como None, que
+  xlsxwriter deja como celda vacía en lugar de fallar
+"""
+import pandas as pd
+
+# Día cero de las fechas de Excel (número de serie 0)
+EXCEL_EPOCA = pd.Timestamp('1899-12-30')
+
+def filas_para_excel(df):
+    """
+    Prepara las filas de un DataFrame de ventas para write_row.
+
+    Las fechas se convierten en una sola operación vectorizada, así
+    xlsxwriter no tiene que convertir celda por celda.
+
+    Args:
+        df: DataFrame con las ventas (incluye la columna fecha)
+
+    Returns:
+        iterator: Tuplas con los valores de cada fila, en orden
+    """
+    datos = df.assign(fecha=(df['fecha'] - EXCEL_EPOCA) / pd.Timedelta(days=1))
+    datos = datos.astype(object).where(datos.notna(), None)
+    return datos.itertuples(index=False, name=None)
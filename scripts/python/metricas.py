@@ -0,0 +1,85 @@
+"""
+MÉTRICAS DE VENTAS CALCULADAS EN POSTGRESQL
+
+Consulta y función compartidas por el reporte de consola (reporte_ventas),
+el envío por email (envio_email) y el pipeline completo, para que todos
+calculen las mismas métricas con el mismo contrato:
+- dict con el rango de fechas y las métricas si hay ventas
+- dict vacío si no hay ventas
+- None si la consulta falla (el error queda registrado)
+"""
+from sqlalchemy import text
+import logging
+
+# Rango de fechas y métricas del período, en un solo recorrido de ventas
+QUERY_METRICAS = text("""
+    WITH ventas_periodo AS (
+        SELECT 
+            v.fecha,
+            c.nombre AS cliente,
+            p.nombre AS producto,
+            v.monto_total
+        FROM ventas v
+        JOIN clientes c ON v.cliente_id = c.cliente_id
+        JOIN productos p ON v.producto_id = p.producto_id
+        WHERE v.fecha IS NOT NULL
+    ),
+    resumen AS (
+        SELECT 
+            MIN(fecha) AS fecha_min,
+            MAX(fecha) AS fecha_max,
+            COUNT(*) AS cantidad,
+            SUM(monto_total) AS total
+        FROM ventas_periodo
+    ),
+    producto_top AS (
+        SELECT producto, SUM(monto_total) AS monto
+        FROM ventas_periodo
+        GROUP BY producto
+        ORDER BY monto DESC, producto  -- Empates: el primero alfabéticamente
+        LIMIT 1
+    ),
+    cliente_top AS (
+        SELECT cliente, SUM(monto_total) AS monto
+        FROM ventas_periodo
+        GROUP BY cliente
+        ORDER BY monto DESC, cliente  -- Empates: el primero alfabéticamente
+        LIMIT 1
+    )
+    SELECT 
+        r.fecha_min,
+        r.fecha_max,
+        r.cantidad,
+        r.total,
+        pt.producto AS producto_top,
+        pt.monto AS monto_producto,
+        ct.cliente AS cliente_top,
+        ct.monto AS monto_cliente
+    FROM resumen r
+    CROSS JOIN producto_top pt
+    CROSS JOIN cliente_top ct
+""")
+
+def obtener_metricas_sql(conn):
+    """
+    Calcula el rango de fechas y las métricas clave directamente en PostgreSQL
+    
+    Las agregaciones se hacen junto a los datos y solo viajan ocho valores,
+    en lugar de traer todas las ventas a pandas para agruparlas. El rango de
+    fechas sale del mismo recorrido, sin una consulta aparte.
+    
+    Args:
+        conn: Conexión abierta a la base de datos
+        
+    Returns:
+        dict: Rango de fechas (fecha_min, fecha_max) y métricas calculadas,
+        vacío si no hay ventas o None si hay error
+    """
+    try:
+        result = conn.execute(QUERY_METRICAS)
+        fila = result.mappings().fetchone()
+        return dict(fila) if fila else {}
+    except Exception as e:
+        logging.error(f"❌ Error al calcular métricas: {str(e)}")
+        return None
+
@@ -0,0 +1,99 @@
+"""
+PIPELINE ETL COMPLETO EN UN SOLO PROCESO
+
+Ejecuta la carga de datos, el reporte de ventas y el envío por email sin
+lanzar un intérprete por script:
+1- Carga el Excel en PostgreSQL (cargar_datos)
+2- Calcula en la base el rango de fechas y las métricas, y consulta las
+   ventas UNA sola vez
+3- En paralelo: genera el reporte adjunto y el Excel de data/output
+4- Muestra el resumen en consola
+5- Envía el email con el reporte adjunto
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cargar_datos
+import envio_email
+import metricas
+import reporte_ventas
+
+# Columnas que usa el Excel de data/output (reporte_ventas)
+COLUMNAS_REPORTE_CONSOLA = ['fecha', 'cliente', 'producto', 'monto_total']
+
+def main():
+    """
+    Ejecuta el flujo ETL completo.
+
+    Returns:
+        bool: True si el proceso terminó correctamente, False si falló
+    """
+    # PASO 1: Cargar los datos del Excel en la base
+    if not cargar_datos.main():
+        return False
+
+    # PASO 2: Métricas y ventas del período (una consulta cada una)
+    # (mismo motor y pool de conexiones que usó la carga; se libera al salir)
+    engine = cargar_datos.get_engine()
+
+    with engine.connect() as conn:
+        # Rango de fechas y métricas en una sola consulta a la base
+        metrics = metricas.obtener_metricas_sql(conn)
+        if metrics is None:
+            return False
+
+        if not metrics:
+            print("\n⚠️ No hay ventas en el período disponible")
+            return True
+        fecha_min, fecha_max = metrics['fecha_min'], metrics['fecha_max']
+        print(f"\nℹ️ Rango de fechas disponible: {fecha_min} a {fecha_max}")
+
+        df = envio_email.obtener_ventas(conn)
+        if df is None:
+            return False
+
+        # PASO 3: Generar los reportes en paralelo (la conexión no se comparte
+        # entre hilos: el CSV, que consulta la base, queda en el hilo principal)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futuro_excel = executor.submit(
+                reporte_ventas.generar_excel_reporte,
+                [df[COLUMNAS_REPORTE_CONSOLA]], fecha_min, fecha_max
+            )
+            if envio_email.FORMATO_REPORTE == "parquet":
+                futuro_adjunto = executor.submit(
+                    envio_email.generar_reporte_parquet, df, fecha_min, fecha_max
+                )
+            elif envio_email.FORMATO_REPORTE != "csv.gz":
+                futuro_adjunto = executor.submit(
+                    envio_email.generar_reporte_excel, df, fecha_min, fecha_max
+                )
+
+            # Los errores de un hilo se relanzan en result(): se informan acá
+            # para que el proceso termine como fallido y no con un traceback
+            try:
+                if envio_email.FORMATO_REPORTE == "csv.gz":
+                    adjunto = envio_email.generar_reporte_csv(conn, fecha_min, fecha_max)
+                else:
+                    adjunto = futuro_adjunto.result()
+                futuro_excel.result()
+            except Exception as e:
+                print(f"\n❌ Error al generar los reportes: {str(e)}")
+                return False
+
+    if not adjunto:
+        return False
+
+    # generar_reporte_csv devuelve (ruta, total); el Excel solo la ruta
+    reporte_path = adjunto[0] if isinstance(adjunto, tuple) else adjunto
+
+    # PASO 4: Mostrar resumen en consola
+    reporte_ventas.imprimir_resumen(metrics, fecha_min, fecha_max, len(df))
+
+    # PASO 5: Enviar el email con el reporte adjunto
+    return envio_email.enviar_email_con_reintentos(
+        reporte_path, metrics, fecha_min, fecha_max, len(df)
+    )
+
+# Punto de entrada del script
+if __name__ == "__main__":
+    main()
@@ -8,47 +8,112 @@ Este script genera:
 Funcionalidades:
 1- Muestra título del reporte en consola
 2- Se conecta a la BD PostgreSQL
-3- Detecta automáticamente el rango de fechas
-4- Obtiene ventas con info de clientes y productos
-5- Calcula métricas (total facturado, productos/cliente destacado)
-6- Muestra reporte en consola
-7- Genera archivo Excel en data/output
-8- Cierra conexión automáticamente
+3- Calcula en la BD el rango de fechas y las métricas (total facturado,
+   productos/cliente destacado) en una sola consulta
+4- Muestra reporte en consola
+5- Lee las ventas por bloques y genera archivo Excel en data/output
+6- Libera las conexiones automáticamente al terminar
 """
 
-import pandas as pd
-from sqlalchemy import create_engine, text
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from sqlalchemy import create_engine
 from datetime import datetime
 import sys
 from pathlib import Path
+import atexit
 import os
+import tempfile
+import xlsxwriter
 
 # Añadir el directorio raíz al path para importar configuraciones
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 # Importar configuración de base de datos
 from config.database import DB_CONFIG, get_db_uri
+from metricas import obtener_metricas_sql  # Métricas calculadas en la DB
+from excel_filas import filas_para_excel  # Filas listas para xlsxwriter
 
-def obtener_rango_fechas(engine):
+# Motor de conexión compartido (se crea la primera vez que se necesita)
+_engine = None
+
+# Bytes de CSV leídos por bloque al recorrer las ventas para el Excel
+TAMANO_BLOQUE = 4 * 1024 * 1024
+
+# Ventas con fecha para el reporte detallado (todo el rango disponible, sin
+# parámetros: se usa dentro de COPY)
+QUERY_VENTAS = """
+    SELECT 
+        v.fecha,
+        c.nombre AS cliente,
+        p.nombre AS producto,
+        v.monto_total
+    FROM ventas v
+    JOIN clientes c ON v.cliente_id = c.cliente_id
+    JOIN productos p ON v.producto_id = p.producto_id
+    WHERE v.fecha IS NOT NULL
+    ORDER BY v.fecha DESC
+"""
+
+def get_engine():
+    """
+    Devuelve el motor de conexión del módulo, creándolo si no existe.
+    
+    Returns:
+        Engine: Motor SQLAlchemy con pool reutilizable (se libera al salir)
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            get_db_uri(),
+            pool_pre_ping=True,  # Descarta conexiones caídas antes de usarlas
+            pool_size=4
+        )
+        atexit.register(_engine.dispose)
+    return _engine
+
+def leer_ventas_por_bloques(conn):
     """
-    Obtiene el rango real de fechas disponible en la base de datos.
+    Lee las ventas por bloques, sin pasar fila por fila por Python.
+    
+    PostgreSQL vuelca el resultado con COPY a un archivo temporal y pyarrow
+    lo lee en bloques columnares, que se convierten a DataFrame de a uno.
     
     Args:
-        engine: Conexión SQLAlchemy a la base de datos.
+        conn: Conexión SQLAlchemy abierta.
         
-    Returns:
-        tuple: (fecha_min, fecha_max) -> Fecha mínima y máxima en la tabla ventas.
+    Yields:
+        DataFrame: Bloque de ventas (fecha, cliente, producto, monto_total)
     """
-    with engine.connect() as conn:
-        result = conn.execute(text("SELECT MIN(fecha), MAX(fecha) FROM ventas"))
-        return result.fetchone()
+    with tempfile.TemporaryFile() as archivo:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY ({QUERY_VENTAS}) TO STDOUT WITH (FORMAT CSV, HEADER)", archivo)
+        finally:
+            cursor.close()
+        archivo.seek(0)
+        
+        lector = pa_csv.open_csv(
+            archivo,
+            read_options=pa_csv.ReadOptions(block_size=TAMANO_BLOQUE),
+            # Tipos fijos: no se infieren del primer bloque (un nombre como
+            # "0012" debe seguir siendo texto en todos los bloques)
+            convert_options=pa_csv.ConvertOptions(column_types={
+                'fecha': pa.timestamp('us'),
+                'cliente': pa.string(),
+                'producto': pa.string(),
+                'monto_total': pa.float64()
+            })
+        )
+        for lote in lector:
+            yield lote.to_pandas()
 
-def generar_excel_reporte(df, fecha_min, fecha_max):
+def generar_excel_reporte(bloques, fecha_min, fecha_max):
     """
     Genera un archivo Excel con el reporte de ventas en data/output
     
     Args:
-        df: DataFrame con los datos de ventas
+        bloques: DataFrames con los datos de ventas, leídos por partes
         fecha_min: Fecha inicio del período
         fecha_max: Fecha fin del período
         
@@ -61,98 +126,102 @@ def generar_excel_reporte(df, fecha_min, fecha_max):
     # Nombre del archivo con rango de fechas
     nombre_archivo = f"data/output/reporte_ventas_{fecha_min.strftime('%Y%m%d')}_{fecha_max.strftime('%Y%m%d')}.xlsx"
     
-    # Generar Excel
-    with pd.ExcelWriter(nombre_archivo, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Ventas')
-        
-        # Obtener objetos para formateo
-        workbook = writer.book
-        worksheet = writer.sheets['Ventas']
-        
-        # Formatear columnas
-        for cell in worksheet['B'][1:]:  # Columna de fechas
-            cell.number_format = 'DD/MM/YYYY'
-            
-        for cell in worksheet['D'][1:]:  # Columna de montos
-            cell.number_format = '"Gs."#,##0'
+    # Generar Excel con xlsxwriter en modo constant_memory: cada fila se
+    # escribe a disco apenas se completa, sin mantener las celdas en memoria
+    workbook = xlsxwriter.Workbook(nombre_archivo, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Ventas')
+    
+    # Formatos (encabezado como el de pandas, fechas y montos en moneda)
+    formato_encabezado = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+    formato_fecha = workbook.add_format({'num_format': 'DD/MM/YYYY'})
+    formato_moneda = workbook.add_format({'num_format': '"Gs."#,##0'})
+    
+    # Ajustar anchos de columnas (y formato de las columnas de fecha y monto)
+    worksheet.set_column('A:A', 12, formato_fecha)  # Fecha
+    worksheet.set_column('B:B', 25)  # Cliente
+    worksheet.set_column('C:C', 25)  # Producto
+    worksheet.set_column('D:D', 15, formato_moneda)  # Monto
+    
+    fila = 0
+    for bloque in bloques:
+        # Encabezados, tomados de las columnas del primer bloque
+        if fila == 0:
+            worksheet.write_row(0, 0, bloque.columns, formato_encabezado)
+            fila = 1
         
-        # Ajustar anchos de columnas
-        worksheet.column_dimensions['A'].width = 12  # Fecha
-        worksheet.column_dimensions['B'].width = 25  # Cliente
-        worksheet.column_dimensions['C'].width = 25  # Producto
-        worksheet.column_dimensions['D'].width = 15  # Monto
+        # Filas de datos, en orden (constant_memory no permite volver atrás),
+        # con las fechas como número de serie y los NULL como celdas vacías
+        for valores in filas_para_excel(bloque):
+            worksheet.write_row(fila, 0, valores)
+            fila += 1
+    
+    workbook.close()
     
     print(f"\n📊 Reporte Excel generado: {nombre_archivo}")
     return nombre_archivo
 
+def imprimir_resumen(metricas, fecha_min, fecha_max, total_ventas):
+    """
+    Muestra en consola el resumen del período con sus métricas principales.
+    
+    Args:
+        metricas: Diccionario con total, producto_top, monto_producto,
+            cliente_top y monto_cliente
+        fecha_min: Fecha inicio del período
+        fecha_max: Fecha fin del período
+        total_ventas: Cantidad de ventas analizadas
+    """
+    print("\n" + "="*50)
+    print("REPORTE DE VENTAS - RESUMEN".center(50))
+    print("="*50)
+    print(f"\nFECHA: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    print(f"PERÍODO ANALIZADO: {fecha_min.strftime('%d/%m/%Y')} al {fecha_max.strftime('%d/%m/%Y')}")
+    print("\nMÉTRICAS PRINCIPALES")
+    print("-"*20)
+    print(f"* TOTAL FACTURADO: Gs. {metricas['total']:,.0f}")
+    print(f"* PRODUCTO DESTACADO: {metricas['producto_top']} (Gs. {metricas['monto_producto']:,.0f})")
+    print(f"* CLIENTE DESTACADO: {metricas['cliente_top']} (Gs. {metricas['monto_cliente']:,.0f})")
+    print("\n" + "="*50)
+    print(f"Total de ventas analizadas: {total_ventas}")
+    print("="*50)
+
 def generar_reporte_consola():
     """
     Genera y muestra el reporte en consola y genera archivo Excel.
     """
     try:
         # 1. Conexión a la base de datos
-        engine = create_engine(get_db_uri())
+        engine = get_engine()
         print("\n✅ Conexión exitosa a PostgreSQL")
         
-        # 2. Obtener rango de fechas
-        fecha_min, fecha_max = obtener_rango_fechas(engine)
-        print(f"\nℹ️ Rango de fechas disponible: {fecha_min} a {fecha_max}")
-        
-        # 3. Consultar datos de ventas
-        query = text("""
-        SELECT 
-            v.fecha,
-            c.nombre AS cliente,
-            p.nombre AS producto,
-            v.monto_total
-        FROM ventas v
-        JOIN clientes c ON v.cliente_id = c.cliente_id
-        JOIN productos p ON v.producto_id = p.producto_id
-        WHERE v.fecha BETWEEN :fecha_inicio AND :fecha_fin
-        ORDER BY v.fecha DESC
-        """)
-        
+        # Una sola conexión para todas las consultas (rango, métricas y ventas)
         with engine.connect() as conn:
-            df = pd.read_sql(
-                query, 
-                conn,
-                params={"fecha_inicio": fecha_min, "fecha_fin": fecha_max}
-            )
+            # 2. Calcular rango de fechas y métricas (agregadas en PostgreSQL,
+            # no en pandas, en una sola consulta)
+            metricas = obtener_metricas_sql(conn)
+            
+            if metricas is None:
+                print("\n❌ Error al calcular las métricas")
+                return
             
-            if df.empty:
+            if not metricas:
                 print("\n⚠️ No hay ventas en el período disponible")
                 return
             
-            # 4. Calcular métricas
-            total_facturado = df['monto_total'].sum()
-            producto_top = df.groupby('producto')['monto_total'].sum().idxmax()
-            monto_producto = df.groupby('producto')['monto_total'].sum().max()
-            cliente_top = df.groupby('cliente')['monto_total'].sum().idxmax()
-            monto_cliente = df.groupby('cliente')['monto_total'].sum().max()
+            # 3. Rango de fechas disponible
+            fecha_min, fecha_max = metricas['fecha_min'], metricas['fecha_max']
+            print(f"\nℹ️ Rango de fechas disponible: {fecha_min} a {fecha_max}")
             
-            # 5. Mostrar reporte en consola
-            print("\n" + "="*50)
-            print("REPORTE DE VENTAS - RESUMEN".center(50))
-            print("="*50)
-            print(f"\nFECHA: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-            print(f"PERÍODO ANALIZADO: {fecha_min.strftime('%d/%m/%Y')} al {fecha_max.strftime('%d/%m/%Y')}")
-            print("\nMÉTRICAS PRINCIPALES")
-            print("-"*20)
-            print(f"* TOTAL FACTURADO: Gs. {total_facturado:,.0f}")
-            print(f"* PRODUCTO DESTACADO: {producto_top} (Gs. {monto_producto:,.0f})")
-            print(f"* CLIENTE DESTACADO: {cliente_top} (Gs. {monto_cliente:,.0f})")
-            print("\n" + "="*50)
-            print(f"Total de ventas analizadas: {len(df)}")
-            print("="*50)
+            # 4. Mostrar reporte en consola
+            imprimir_resumen(metricas, fecha_min, fecha_max, metricas['cantidad'])
             
-            # 6. Generar archivo Excel
-            generar_excel_reporte(df, fecha_min, fecha_max)
+            # 5. Generar archivo Excel, leyendo las ventas por bloques
+            # (nunca se cargan todas juntas en memoria)
+            bloques = leer_ventas_por_bloques(conn)
+            generar_excel_reporte(bloques, fecha_min, fecha_max)
             
     except Exception as e:
         print(f"\n❌ Error inesperado: {str(e)}")
-    finally:
-        if 'engine' in locals():
-            engine.dispose()
 
 if __name__ == "__main__":
     print("\n" + "="*50)
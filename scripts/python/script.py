@@ -1,23 +1,17 @@
 '''
     Este es un Script para correr automaticamente los 3 archivos de Python 
     Que realizan el proceso de Carga de datos, Reporte de Ventas y Envio del Email.
+    
+    Todo corre en un mismo proceso (ver pipeline.py): las ventas se consultan
+    una sola vez y se reutilizan para el reporte y el email.
 '''
 
-import subprocess
 import sys
 
-scripts = [
-    "scripts/python/cargar_datos.py",
-    "scripts/python/reporte_ventas.py",
-    "scripts/python/envio_email.py"
-]
+from pipeline import main
 
-for script in scripts:
-    try:
-        print(f"Ejecutando {script}...")
-        subprocess.run([sys.executable, script], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error al ejecutar {script}: {e}")
-        sys.exit(1)
+if not main():
+    print("Error al ejecutar el proceso ETL")
+    sys.exit(1)
 
-print("Proceso ETL completado exitosamente!")
\ No newline at end of file
+print("Proceso ETL completado exitosamente!")